@@ -9,7 +9,7 @@
 # - Handles Ctrl+C / graceful shutdown cleanly
 # - Works on Windows only
 
-import ctypes, ctypes.wintypes, sys, threading, time, signal, os, glob
+import ctypes, ctypes.wintypes, sys, threading, time, signal, gc, queue, collections, contextlib, socket
 
 if sys.platform != "win32":
     print("Windows only.")
@@ -17,7 +17,8 @@ if sys.platform != "win32":
 
 user32 = ctypes.windll.user32
 kernel32 = ctypes.windll.kernel32
-winmm = ctypes.windll.winmm  # for waveOutSetVolume fallback
+winmm = ctypes.windll.winmm  # for waveOutSetVolume fallback and timeBeginPeriod
+ws2_32 = ctypes.windll.ws2_32  # WSAEventSelect for the Ctrl+C wakeup socket
 
 # pointer-sized types
 PTR_SIZE = ctypes.sizeof(ctypes.c_void_p)
@@ -38,6 +39,11 @@ class KBDLLHOOKSTRUCT(ctypes.Structure):
         ("dwExtraInfo", ULONG_PTR)
     ]
 
+# Field offsets so the hook can read the two DWORDs it needs straight from lParam
+# without building a pointer + Structure wrapper per keystroke.
+_KB_VK_OFF = KBDLLHOOKSTRUCT.vkCode.offset
+_KB_FLAGS_OFF = KBDLLHOOKSTRUCT.flags.offset
+
 # Windows input structures for SendInput (mouse + keyboard)
 class MOUSEINPUT(ctypes.Structure):
     _fields_ = [
@@ -71,6 +77,11 @@ WM_KEYDOWN = 0x0100
 WM_KEYUP = 0x0101
 WM_SYSKEYDOWN = 0x0104
 WM_SYSKEYUP = 0x0105
+WM_QUIT = 0x0012
+PM_REMOVE = 0x0001
+QS_ALLINPUT = 0x04FF
+MWMO_INPUTAVAILABLE = 0x0004
+FD_READ = 0x01
 
 WHEEL_DELTA = 120
 
@@ -122,6 +133,14 @@ INPUT_MOUSE = 0
 INPUT_KEYBOARD = 1
 KEYEVENTF_KEYUP = 0x0002
 
+THREAD_PRIORITY_ABOVE_NORMAL = 1
+
+# kernel event / waitable timer constants
+INFINITE = 0xFFFFFFFF
+WAIT_OBJECT_0 = 0
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+TIMER_ALL_ACCESS = 0x1F0003
+
 # Console color (Windows 10+ Virtual Terminal)
 VT_ENABLED = False
 CSI = "\x1b["
@@ -139,6 +158,19 @@ C_WHITE = CSI + "37m"
 def _c(s, color):
     return f"{color}{s}{C_RESET}" if VT_ENABLED else s
 
+def enable_dpi_awareness():
+    # Must run before the first GetSystemMetrics/GetCursorPos so the virtual-screen bounds and the
+    # cursor position are in physical pixels on every monitor. Per-monitor v2 needs Windows 10 1703+;
+    # older systems fall back to system-wide awareness.
+    DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2 = ctypes.c_void_p(-4)
+    try:
+        set_context = getattr(user32, "SetProcessDpiAwarenessContext", None)
+        if set_context is not None and set_context(DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2):
+            return
+        user32.SetProcessDPIAware()
+    except Exception:
+        pass
+
 def enable_vt_console_colors():
     global VT_ENABLED
     try:
@@ -159,6 +191,40 @@ def enable_vt_console_colors():
     except Exception:
         VT_ENABLED = False
 
+# Status output from the hook and the worker goes through a small queue drained by a logger thread,
+# so a slow console (conhost can stall for milliseconds) never blocks a keystroke or a tick.
+_log_q = queue.Queue(maxsize=64)
+_log_thread = None
+
+def _log(*args):
+    """print(*args) from the logger thread; dropped silently if the queue is full."""
+    try:
+        _log_q.put_nowait(args)
+    except queue.Full:
+        pass
+
+def _log_worker():
+    while True:
+        args = _log_q.get()
+        if args is None:
+            break
+        print(*args)
+
+def start_logger():
+    global _log_thread
+    _log_thread = threading.Thread(target=_log_worker, daemon=True)
+    _log_thread.start()
+
+def stop_logger():
+    """Print whatever is still queued, then stop the logger thread."""
+    if _log_thread is None:
+        return
+    try:
+        _log_q.put(None, timeout=1.0)
+    except queue.Full:
+        pass
+    _log_thread.join(timeout=1.0)
+
 # Hook prototype
 HOOKPROC = ctypes.WINFUNCTYPE(LRESULT, ctypes.c_int, ctypes.wintypes.WPARAM, ctypes.wintypes.LPARAM)
 
@@ -167,6 +233,7 @@ user32.SetWindowsHookExW.argtypes = [ctypes.c_int, HOOKPROC, ctypes.wintypes.HIN
 user32.SetWindowsHookExW.restype = ctypes.c_void_p
 user32.CallNextHookEx.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.wintypes.WPARAM, ctypes.wintypes.LPARAM]
 user32.CallNextHookEx.restype = LRESULT
+_call_next_hook = user32.CallNextHookEx  # bound once; called on every keystroke
 user32.UnhookWindowsHookEx.argtypes = [ctypes.c_void_p]
 user32.UnhookWindowsHookEx.restype = ctypes.wintypes.BOOL
 
@@ -177,11 +244,70 @@ user32.GetMessageW.restype = ctypes.c_int
 SendInput = user32.SendInput
 SendInput.argtypes = (ctypes.wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
 SendInput.restype = ctypes.wintypes.UINT
+_INPUT_SIZE = ctypes.sizeof(INPUT)  # cbSize argument, constant for the process
+
+# Kernel event / waitable timer prototypes (movement worker wake-ups); HANDLE restypes so 64-bit
+# handles aren't truncated to int.
+kernel32.CreateEventW.argtypes = [ctypes.c_void_p, ctypes.wintypes.BOOL, ctypes.wintypes.BOOL, ctypes.wintypes.LPCWSTR]
+kernel32.CreateEventW.restype = ctypes.wintypes.HANDLE
+kernel32.SetEvent.argtypes = [ctypes.wintypes.HANDLE]
+kernel32.SetEvent.restype = ctypes.wintypes.BOOL
+kernel32.CreateWaitableTimerExW.argtypes = [ctypes.c_void_p, ctypes.wintypes.LPCWSTR, ctypes.wintypes.DWORD, ctypes.wintypes.DWORD]
+kernel32.CreateWaitableTimerExW.restype = ctypes.wintypes.HANDLE
+kernel32.SetWaitableTimer.argtypes = [ctypes.wintypes.HANDLE, ctypes.POINTER(ctypes.wintypes.LARGE_INTEGER), ctypes.wintypes.LONG,
+                                      ctypes.c_void_p, ctypes.c_void_p, ctypes.wintypes.BOOL]
+kernel32.SetWaitableTimer.restype = ctypes.wintypes.BOOL
+kernel32.CancelWaitableTimer.argtypes = [ctypes.wintypes.HANDLE]
+kernel32.CancelWaitableTimer.restype = ctypes.wintypes.BOOL
+kernel32.WaitForSingleObject.argtypes = [ctypes.wintypes.HANDLE, ctypes.wintypes.DWORD]
+kernel32.WaitForSingleObject.restype = ctypes.wintypes.DWORD
+kernel32.WaitForMultipleObjects.argtypes = [ctypes.wintypes.DWORD, ctypes.POINTER(ctypes.wintypes.HANDLE), ctypes.wintypes.BOOL, ctypes.wintypes.DWORD]
+kernel32.WaitForMultipleObjects.restype = ctypes.wintypes.DWORD
+kernel32.CloseHandle.argtypes = [ctypes.wintypes.HANDLE]
+kernel32.CloseHandle.restype = ctypes.wintypes.BOOL
+
+# Remaining functions we call repeatedly (or that return handles). Declaring them lets ctypes convert
+# arguments through the fixed types instead of guessing per call, and keeps 64-bit handles intact.
+user32.GetCursorPos.argtypes = [ctypes.POINTER(ctypes.wintypes.POINT)]
+user32.GetCursorPos.restype = ctypes.wintypes.BOOL
+user32.GetSystemMetrics.argtypes = [ctypes.c_int]
+user32.GetSystemMetrics.restype = ctypes.c_int
+user32.SetProcessDPIAware.argtypes = []
+user32.SetProcessDPIAware.restype = ctypes.wintypes.BOOL
+kernel32.GetCurrentThread.argtypes = []
+kernel32.GetCurrentThread.restype = ctypes.wintypes.HANDLE
+kernel32.SetThreadPriority.argtypes = [ctypes.wintypes.HANDLE, ctypes.c_int]
+kernel32.SetThreadPriority.restype = ctypes.wintypes.BOOL
+kernel32.GetModuleHandleW.argtypes = [ctypes.wintypes.LPCWSTR]
+kernel32.GetModuleHandleW.restype = ctypes.wintypes.HMODULE
+winmm.waveOutSetVolume.argtypes = [ctypes.wintypes.HANDLE, ctypes.wintypes.DWORD]
+winmm.waveOutSetVolume.restype = ctypes.wintypes.UINT
+winmm.timeBeginPeriod.argtypes = [ctypes.wintypes.UINT]
+winmm.timeBeginPeriod.restype = ctypes.wintypes.UINT
+winmm.timeEndPeriod.argtypes = [ctypes.wintypes.UINT]
+winmm.timeEndPeriod.restype = ctypes.wintypes.UINT
+
+# message pump with the Ctrl+C wakeup event
+user32.MsgWaitForMultipleObjectsEx.argtypes = [ctypes.wintypes.DWORD, ctypes.POINTER(ctypes.wintypes.HANDLE), ctypes.wintypes.DWORD,
+                                               ctypes.wintypes.DWORD, ctypes.wintypes.DWORD]
+user32.MsgWaitForMultipleObjectsEx.restype = ctypes.wintypes.DWORD
+user32.PeekMessageW.argtypes = [ctypes.POINTER(ctypes.wintypes.MSG), ctypes.wintypes.HWND, ctypes.wintypes.UINT, ctypes.wintypes.UINT,
+                                ctypes.wintypes.UINT]
+user32.PeekMessageW.restype = ctypes.wintypes.BOOL
+kernel32.ResetEvent.argtypes = [ctypes.wintypes.HANDLE]
+kernel32.ResetEvent.restype = ctypes.wintypes.BOOL
+ws2_32.WSACreateEvent.argtypes = []
+ws2_32.WSACreateEvent.restype = ctypes.wintypes.HANDLE
+ws2_32.WSAEventSelect.argtypes = [ctypes.c_size_t, ctypes.wintypes.HANDLE, ctypes.c_long]  # SOCKET is UINT_PTR
+ws2_32.WSAEventSelect.restype = ctypes.c_int
+ws2_32.WSACloseEvent.argtypes = [ctypes.wintypes.HANDLE]
+ws2_32.WSACloseEvent.restype = ctypes.wintypes.BOOL
 
 # Globals
 hook_handle = None
 _hook_proc_ref = None
-_loaded_module_handle = None
+_wakeup_socks = None   # (read, write) socketpair registered with signal.set_wakeup_fd
+_wakeup_event = None   # Win32 event signalled when the read end becomes readable
 
 # Which keys we intercept and block (blocking behavior)
 # ESC removed as requested (won't forcibly exit). TAB is included but will be allowed through when Alt is held.
@@ -200,9 +326,90 @@ SCRIPT_KEYS = {
     VK_F,         # F => middle click
 }
 
-# pressed keys tracked by the hook:
-pressed_keys = set()
-pressed_lock = threading.Lock()
+# Keys that are always blocked from reaching apps, regardless of active/Ctrl:
+# - VK_OEM_3 (backtick) is RESERVED for toggling.
+ALWAYS_BLOCK_KEYS = {VK_OEM_3}
+
+# Keys whose up/down the movement worker reacts to (script keys plus the passthrough modifiers).
+WORKER_KEYS = SCRIPT_KEYS | {
+    VK_LCONTROL, VK_RCONTROL, VK_CONTROL,
+    VK_LMENU, VK_RMENU, VK_MENU,
+    VK_LWIN, VK_RWIN,
+}
+
+# Per-vk classification flags, precomputed so the hook does one bytes index instead of set lookups
+# and special cases:
+# KF_SCRIPT = swallow while the script is active and neither Ctrl nor Win is held,
+# KF_ALWAYS_BLOCK = always swallow, KF_ALT_PASS = let it through while Alt is held (Alt+Tab),
+# KF_HANDLED = the hook has something to do for this key (tracked, Shift+Enter, volume keys).
+# A key with no flags at all goes straight to CallNextHookEx.
+KF_SCRIPT, KF_ALWAYS_BLOCK, KF_ALT_PASS, KF_HANDLED = 1, 2, 4, 8
+_HOOK_KEYS = WORKER_KEYS | {VK_RETURN, VK_OEM_4, VK_OEM_6}
+_KEY_FLAGS = bytes(
+    (KF_SCRIPT if vk in SCRIPT_KEYS else 0)
+    | (KF_ALWAYS_BLOCK if vk in ALWAYS_BLOCK_KEYS else 0)
+    | (KF_ALT_PASS if vk == VK_TAB else 0)
+    | (KF_HANDLED if vk in _HOOK_KEYS else 0)
+    for vk in range(256)
+)
+
+# Pressed keys tracked by the hook, packed into one int: each key in WORKER_KEYS owns a bit.
+# Only the hook thread writes _pressed_mask; rebinding a module global is atomic under the GIL,
+# so the worker can read it without a lock and gets a consistent snapshot in a single load.
+_VK_BIT = {vk: 1 << i for i, vk in enumerate(sorted(WORKER_KEYS))}
+BIT_W, BIT_A, BIT_S, BIT_D = (_VK_BIT[vk] for vk in (VK_W, VK_A, VK_S, VK_D))
+BIT_UP, BIT_LEFT, BIT_DOWN, BIT_RIGHT = (_VK_BIT[vk] for vk in (VK_UP, VK_LEFT, VK_DOWN, VK_RIGHT))
+BIT_LSHIFT, BIT_RSHIFT = _VK_BIT[VK_LSHIFT], _VK_BIT[VK_RSHIFT]
+BIT_LCONTROL, BIT_RCONTROL, BIT_CONTROL = (_VK_BIT[vk] for vk in (VK_LCONTROL, VK_RCONTROL, VK_CONTROL))
+BIT_LMENU, BIT_RMENU, BIT_MENU = (_VK_BIT[vk] for vk in (VK_LMENU, VK_RMENU, VK_MENU))
+BIT_LWIN, BIT_RWIN = _VK_BIT[VK_LWIN], _VK_BIT[VK_RWIN]
+BIT_1, BIT_2, BIT_NUMPAD1, BIT_NUMPAD2 = (_VK_BIT[vk] for vk in (VK_1, VK_2, VK_NUMPAD1, VK_NUMPAD2))
+BIT_3, BIT_4, BIT_NUMPAD3, BIT_NUMPAD4 = (_VK_BIT[vk] for vk in (VK_3, VK_4, VK_NUMPAD3, VK_NUMPAD4))
+BIT_OEM_MINUS, BIT_SUBTRACT = _VK_BIT[VK_OEM_MINUS], _VK_BIT[VK_SUBTRACT]
+BIT_OEM_PLUS, BIT_ADD = _VK_BIT[VK_OEM_PLUS], _VK_BIT[VK_ADD]
+BIT_CAPITAL, BIT_TAB, BIT_OEM_3, BIT_F = (_VK_BIT[vk] for vk in (VK_CAPITAL, VK_TAB, VK_OEM_3, VK_F))
+
+# Key groups the hook/worker test every event/tick, OR-ed together once here
+MASK_CTRL = BIT_LCONTROL | BIT_RCONTROL | BIT_CONTROL
+MASK_ALT = BIT_LMENU | BIT_RMENU | BIT_MENU
+MASK_SHIFT = BIT_LSHIFT | BIT_RSHIFT
+MASK_WIN = BIT_LWIN | BIT_RWIN
+# Arrow keys behave like WASD, so each direction is the letter key or its arrow.
+MASK_UP = BIT_W | BIT_UP
+MASK_LEFT = BIT_A | BIT_LEFT
+MASK_DOWN = BIT_S | BIT_DOWN
+MASK_RIGHT = BIT_D | BIT_RIGHT
+MASK_MOVE = MASK_UP | MASK_LEFT | MASK_DOWN | MASK_RIGHT
+MASK_SCROLL_UP = BIT_1 | BIT_NUMPAD1
+MASK_SCROLL_DOWN = BIT_2 | BIT_NUMPAD2
+MASK_SCROLL_LEFT = BIT_3 | BIT_NUMPAD3
+MASK_SCROLL_RIGHT = BIT_4 | BIT_NUMPAD4
+MASK_PLUS = BIT_OEM_PLUS | BIT_ADD
+MASK_MINUS = BIT_OEM_MINUS | BIT_SUBTRACT
+
+# vk -> bit (0 for untracked keys) as a flat 256-entry table, so the hook indexes instead of hashing.
+# Groups stay as masks over per-key bits rather than shared category bits: with a shared bit,
+# releasing '1' while Numpad1 is still held would clear "scroll up".
+_VK_BIT_TABLE = tuple(_VK_BIT.get(vk, 0) for vk in range(256))
+
+# (mask & MASK_MOVE) -> (x sign, y sign) for every combination of held direction keys (256 entries),
+# so the worker turns the held keys into a direction with one lookup. Opposite keys cancel out.
+_MOVE_DIR = {}
+_m = MASK_MOVE
+while True:
+    _MOVE_DIR[_m] = (bool(_m & MASK_RIGHT) - bool(_m & MASK_LEFT), bool(_m & MASK_DOWN) - bool(_m & MASK_UP))
+    if not _m:
+        break
+    _m = (_m - 1) & MASK_MOVE
+del _m
+
+_pressed_mask = 0
+
+# Auto-reset kernel event set by the hook whenever one of WORKER_KEYS changes state; the worker sleeps
+# on it while idle. A kernel object rather than threading.Event so the worker can wait on it together
+# with its tick timer in one WaitForMultipleObjects call.
+_wake_event = kernel32.CreateEventW(None, False, False, None)
+_set_event = kernel32.SetEvent  # bound once; called from the hook
 
 # active toggle (ON by default)
 active = True
@@ -222,18 +429,86 @@ def _format_last_error():
     kernel32.FormatMessageW(0x00001000, None, err, 0, buf, len(buf), None)
     return f"WinErr {err}: {buf.value.strip()}"
 
-# helper mouse/keyboard functions using SendInput (so Windows treats them like real input)
+# helper mouse/keyboard functions using SendInput (so Windows treats them like real input).
+# The queue_* helpers only fill a slot of a caller-owned INPUT array; flush_inputs() sends the
+# whole array in one SendInput call so a worker tick costs a single user->kernel transition.
 def get_cursor_pos():
     pt = ctypes.wintypes.POINT()
     user32.GetCursorPos(ctypes.byref(pt))
     return pt.x, pt.y
 
-def set_cursor_pos(x, y):
+def flush_inputs(buf, n):
     """
-    Move cursor using SendInput absolute coordinates across the virtual screen.
-    This generates WM_MOUSEMOVE events that Windows UI animations (taskbar/settings) will see.
+    Submit the first 'n' queued INPUT entries of 'buf' with a single SendInput call.
+    'buf' may be the INPUT array itself or a POINTER(INPUT) to it cast once up front
+    (which matches SendInput's argtypes exactly and skips the per-call conversion).
+    ctypes drops the GIL for the duration of the call, so the hook (which needs the GIL to run its
+    Python callback) is never held up behind an injection in progress on this thread.
     """
-    # virtual screen bounds
+    if n:
+        SendInput(n, buf, _INPUT_SIZE)
+
+# Prefilled INPUT templates, built once. The queue_* helpers copy a template into the
+# tick buffer (a plain memcpy) and only write the fields that vary per event.
+def _mouse_template(flags):
+    inp = INPUT()
+    inp.type = INPUT_MOUSE
+    inp.mi.dwFlags = flags
+    return inp
+
+def _key_template(vk, flags=0):
+    inp = INPUT()
+    inp.type = INPUT_KEYBOARD
+    inp.ki.wVk = vk
+    inp.ki.dwFlags = flags
+    return inp
+
+_INP_MOVE_ABS   = _mouse_template(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE)
+_INP_LEFTDOWN   = _mouse_template(MOUSEEVENTF_LEFTDOWN)
+_INP_LEFTUP     = _mouse_template(MOUSEEVENTF_LEFTUP)
+_INP_RIGHTDOWN  = _mouse_template(MOUSEEVENTF_RIGHTDOWN)
+_INP_RIGHTUP    = _mouse_template(MOUSEEVENTF_RIGHTUP)
+_INP_MIDDLEDOWN = _mouse_template(MOUSEEVENTF_MIDDLEDOWN)
+_INP_MIDDLEUP   = _mouse_template(MOUSEEVENTF_MIDDLEUP)
+_INP_WHEEL      = _mouse_template(MOUSEEVENTF_WHEEL)
+_INP_HWHEEL     = _mouse_template(MOUSEEVENTF_HWHEEL)
+_INP_CAPS_DOWN  = _key_template(VK_CAPITAL)
+_INP_CAPS_UP    = _key_template(VK_CAPITAL, KEYEVENTF_KEYUP)
+_INP_LSHIFT_DOWN = _key_template(VK_LSHIFT)
+_INP_LSHIFT_UP   = _key_template(VK_LSHIFT, KEYEVENTF_KEYUP)
+_INP_RSHIFT_DOWN = _key_template(VK_RSHIFT)
+_INP_RSHIFT_UP   = _key_template(VK_RSHIFT, KEYEVENTF_KEYUP)
+
+# Shift+Enter passthrough sends from inside the hook: keep its SendInput arguments fully prebuilt
+# (byref objects included) so that path allocates nothing.
+_SHIFT_DOWN_ARG = {VK_LSHIFT: ctypes.byref(_INP_LSHIFT_DOWN), VK_RSHIFT: ctypes.byref(_INP_RSHIFT_DOWN)}
+_SHIFT_UP_ARG = {VK_LSHIFT: ctypes.byref(_INP_LSHIFT_UP), VK_RSHIFT: ctypes.byref(_INP_RSHIFT_UP)}
+
+# CapsLock right-click sequence: two CapsLock toggles (net-zero CapsLock state, but real keyboard
+# events) followed by the right click. SendInput inserts the array into the input stream in order,
+# so no sleeps are needed between the entries.
+_CAPS_RIGHT_CLICK_SEQ = (INPUT * 6)(
+    _INP_CAPS_DOWN, _INP_CAPS_UP,
+    _INP_CAPS_DOWN, _INP_CAPS_UP,
+    _INP_RIGHTDOWN, _INP_RIGHTUP,
+)
+_CAPS_RIGHT_CLICK_LEN = len(_CAPS_RIGHT_CLICK_SEQ)
+_CAPS_RIGHT_CLICK_BYTES = ctypes.sizeof(_CAPS_RIGHT_CLICK_SEQ)
+
+# Prebuilt down+up pairs for the edge-triggered clicks, copied into the tick buffer with one memmove
+_LCLICK_PAIR = (INPUT * 2)(_INP_LEFTDOWN, _INP_LEFTUP)
+_MCLICK_PAIR = (INPUT * 2)(_INP_MIDDLEDOWN, _INP_MIDDLEUP)
+_PAIR_BYTES = ctypes.sizeof(_LCLICK_PAIR)
+
+# Virtual screen bounds, cached by refresh_virtual_screen() so cursor moves don't query user32.
+# _VS_SX/_VS_SY scale a pixel offset into the 0..65535 range used by absolute SendInput.
+_VS_LEFT = _VS_TOP = 0
+_VS_RIGHT = _VS_BOTTOM = 0
+_VS_SX = _VS_SY = 0.0
+
+def refresh_virtual_screen():
+    """Re-read the virtual screen bounds (call again after a display configuration change)."""
+    global _VS_LEFT, _VS_TOP, _VS_RIGHT, _VS_BOTTOM, _VS_SX, _VS_SY
     left = user32.GetSystemMetrics(76)   # SM_XVIRTUALSCREEN
     top  = user32.GetSystemMetrics(77)   # SM_YVIRTUALSCREEN
     width = user32.GetSystemMetrics(78)  # SM_CXVIRTUALSCREEN
@@ -243,392 +518,336 @@ def set_cursor_pos(x, y):
     if width <= 1: width = max(1, user32.GetSystemMetrics(0))
     if height <= 1: height = max(1, user32.GetSystemMetrics(1))
 
-    # clamp coords to virtual screen
-    tx = max(left, min(left + width - 1, int(x)))
-    ty = max(top,  min(top + height - 1, int(y)))
+    _VS_LEFT, _VS_TOP = left, top
+    _VS_RIGHT, _VS_BOTTOM = left + width - 1, top + height - 1
+    _VS_SX = 65535.0 / max(1, width - 1)
+    _VS_SY = 65535.0 / max(1, height - 1)
 
-    # convert to 0..65535 range expected by SendInput for absolute movement
-    abs_x = int((tx - left) * 65535 // (width - 1))
-    abs_y = int((ty - top)  * 65535 // (height - 1))
-
-    inp = INPUT()
-    inp.type = INPUT_MOUSE
-    # populate the MOUSEINPUT sub-structure
-    inp.mi.dx = abs_x
-    inp.mi.dy = abs_y
-    inp.mi.mouseData = 0
-    inp.mi.dwFlags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE
-    inp.mi.time = 0
-    inp.mi.dwExtraInfo = 0
-
-    SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
-
-def send_left_click():
-    # left down
-    down = INPUT()
-    down.type = INPUT_MOUSE
-    down.mi.dx = 0; down.mi.dy = 0; down.mi.mouseData = 0
-    down.mi.dwFlags = MOUSEEVENTF_LEFTDOWN
-    down.mi.time = 0; down.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(down), ctypes.sizeof(down))
-    # left up
-    up = INPUT()
-    up.type = INPUT_MOUSE
-    up.mi.dx = 0; up.mi.dy = 0; up.mi.mouseData = 0
-    up.mi.dwFlags = MOUSEEVENTF_LEFTUP
-    up.mi.time = 0; up.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(up), ctypes.sizeof(up))
-
-def send_left_down():
-    down = INPUT()
-    down.type = INPUT_MOUSE
-    down.mi.dx = 0; down.mi.dy = 0; down.mi.mouseData = 0
-    down.mi.dwFlags = MOUSEEVENTF_LEFTDOWN
-    down.mi.time = 0; down.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(down), ctypes.sizeof(down))
-
-def send_left_up():
-    up = INPUT()
-    up.type = INPUT_MOUSE
-    up.mi.dx = 0; up.mi.dy = 0; up.mi.mouseData = 0
-    up.mi.dwFlags = MOUSEEVENTF_LEFTUP
-    up.mi.time = 0; up.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(up), ctypes.sizeof(up))
-
-def send_right_click():
-    # right down
-    down = INPUT()
-    down.type = INPUT_MOUSE
-    down.mi.dx = 0; down.mi.dy = 0; down.mi.mouseData = 0
-    down.mi.dwFlags = MOUSEEVENTF_RIGHTDOWN
-    down.mi.time = 0; down.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(down), ctypes.sizeof(down))
-    # right up
-    up = INPUT()
-    up.type = INPUT_MOUSE
-    up.mi.dx = 0; up.mi.dy = 0; up.mi.mouseData = 0
-    up.mi.dwFlags = MOUSEEVENTF_RIGHTUP
-    up.mi.time = 0; up.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(up), ctypes.sizeof(up))
-
-def send_middle_click():
-    # middle down
-    down = INPUT()
-    down.type = INPUT_MOUSE
-    down.mi.dx = 0; down.mi.dy = 0; down.mi.mouseData = 0
-    down.mi.dwFlags = MOUSEEVENTF_MIDDLEDOWN
-    down.mi.time = 0; down.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(down), ctypes.sizeof(down))
-    # middle up
-    up = INPUT()
-    up.type = INPUT_MOUSE
-    up.mi.dx = 0; up.mi.dy = 0; up.mi.mouseData = 0
-    up.mi.dwFlags = MOUSEEVENTF_MIDDLEUP
-    up.mi.time = 0; up.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(up), ctypes.sizeof(up))
-
-def send_scroll(delta):
-    sc = INPUT()
-    sc.type = INPUT_MOUSE
-    sc.mi.dx = 0; sc.mi.dy = 0
-    sc.mi.mouseData = int(delta)
-    sc.mi.dwFlags = MOUSEEVENTF_WHEEL
-    sc.mi.time = 0; sc.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(sc), ctypes.sizeof(sc))
-
-def send_hscroll(delta):
+def queue_cursor_pos(buf, n, x, y):
     """
-    Horizontal scroll. Positive delta scrolls RIGHT, negative scrolls LEFT.
+    Queue a cursor move using SendInput absolute coordinates across the virtual screen.
+    This generates WM_MOUSEMOVE events that Windows UI animations (taskbar/settings) will see.
+    x/y must already be clamped to the virtual screen (the worker clamps while tracking the cursor).
     """
-    sc = INPUT()
-    sc.type = INPUT_MOUSE
-    sc.mi.dx = 0; sc.mi.dy = 0
-    sc.mi.mouseData = int(delta)
-    sc.mi.dwFlags = MOUSEEVENTF_HWHEEL
-    sc.mi.time = 0; sc.mi.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(sc), ctypes.sizeof(sc))
-
-def send_key_vk(vk):
-    """Send a synthetic keyboard press+release for virtual-key 'vk' via SendInput."""
-    send_vk_down(vk)
-    time.sleep(0.001)
-    send_vk_up(vk)
-
-def send_vk_down(vk):
-    down = INPUT()
-    down.type = INPUT_KEYBOARD
-    down.ki.wVk = vk
-    down.ki.wScan = 0
-    down.ki.dwFlags = 0
-    down.ki.time = 0
-    down.ki.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(down), ctypes.sizeof(down))
-
-def send_vk_up(vk):
-    up = INPUT()
-    up.type = INPUT_KEYBOARD
-    up.ki.wVk = vk
-    up.ki.wScan = 0
-    up.ki.dwFlags = KEYEVENTF_KEYUP
-    up.ki.time = 0
-    up.ki.dwExtraInfo = 0
-    SendInput(1, ctypes.byref(up), ctypes.sizeof(up))
-
-def send_caps_double_toggle():
+    # convert to 0..65535 range expected by SendInput for absolute movement
+    buf[n] = _INP_MOVE_ABS
+    mi = buf[n].mi
+    mi.dx = int((x - _VS_LEFT) * _VS_SX)
+    mi.dy = int((y - _VS_TOP) * _VS_SY)
+    return n + 1
+
+def queue_left_click(buf, n):
+    ctypes.memmove(ctypes.addressof(buf) + n * _INPUT_SIZE, _LCLICK_PAIR, _PAIR_BYTES)
+    return n + 2
+
+def queue_left_down(buf, n):
+    buf[n] = _INP_LEFTDOWN
+    return n + 1
+
+def queue_left_up(buf, n):
+    buf[n] = _INP_LEFTUP
+    return n + 1
+
+def queue_middle_click(buf, n):
+    ctypes.memmove(ctypes.addressof(buf) + n * _INPUT_SIZE, _MCLICK_PAIR, _PAIR_BYTES)
+    return n + 2
+
+# The slot is filled from the prefilled template (one struct copy: type, flags, time and dwExtraInfo all
+# come from it); only mouseData varies. delta is always an int multiple of WHEEL_DELTA.
+def queue_scroll(buf, n, delta):
+    buf[n] = _INP_WHEEL
+    buf[n].mi.mouseData = delta
+    return n + 1
+
+def queue_hscroll(buf, n, delta):
     """
-    Send two synthetic CapsLock toggles (press+release twice).
-    This results in net-zero change of CapsLock state but produces real keyboard events.
+    Horizontal scroll. Positive delta scrolls RIGHT, negative scrolls LEFT.
     """
-    send_key_vk(VK_CAPITAL)
-    time.sleep(0.01)
-    send_key_vk(VK_CAPITAL)
-    time.sleep(0.01)
+    buf[n] = _INP_HWHEEL
+    buf[n].mi.mouseData = delta
+    return n + 1
 
-def _always_block_key(vk):
-    """
-    Keys that are always blocked from reaching apps, regardless of active/Ctrl:
-    - VK_OEM_3 (backtick) is RESERVED for toggling.
-    """
-    return vk == VK_OEM_3
+def queue_caps_right_click(buf, n):
+    """Queue the prebuilt CapsLock double-toggle + right click sequence with one memmove."""
+    ctypes.memmove(ctypes.addressof(buf) + n * _INPUT_SIZE, _CAPS_RIGHT_CLICK_SEQ, _CAPS_RIGHT_CLICK_BYTES)
+    return n + _CAPS_RIGHT_CLICK_LEN
+
+# send_left_up releases a held drag on shutdown.
+_INP_LEFTUP_ARG = ctypes.byref(_INP_LEFTUP)
+
+def send_left_up():
+    SendInput(1, _INP_LEFTUP_ARG, _INPUT_SIZE)
 
 def _maybe_release_synth_shift():
     global synth_shift_active, synth_shift_vk
     if synth_shift_active and synth_shift_vk is not None:
         try:
-            send_vk_up(synth_shift_vk)
+            SendInput(1, _SHIFT_UP_ARG[synth_shift_vk], _INPUT_SIZE)
         except Exception:
             pass
         synth_shift_active = False
         synth_shift_vk = None
 
 # Volume helper using waveOutSetVolume fallback (left & right channels)
-def set_master_volume_percent(percent):
-    """
-    Set system volume to a percentage (0..100) using waveOutSetVolume as a compatible fallback.
-    If percent is outside 0..100, it will be clamped.
-    """
+def _volume_dword(percent):
+    """waveOutSetVolume DWORD for a percentage (0..100, clamped), same level on both channels."""
+    p = float(percent)
+    if p < 0.0: p = 0.0
+    if p > 100.0: p = 100.0
+    # waveOutSetVolume expects 0x0000..0xFFFF for each channel.
+    vol = int(round((p / 100.0) * 0xFFFF)) & 0xFFFF
+    return (vol << 16) | vol  # high word = right, low = left
+
+def _set_volume_raw(dwVolume):
     try:
-        p = float(percent)
-        if p < 0.0: p = 0.0
-        if p > 100.0: p = 100.0
-        # waveOutSetVolume expects 0x0000..0xFFFF for each channel.
-        vol = int(round((p / 100.0) * 0xFFFF)) & 0xFFFF
-        dwVolume = (vol << 16) | vol  # high word = right, low = left
         # waveOutSetVolume takes (HWAVEOUT hwo, DWORD dwVolume)
-        # Using hwo = 0 sets the first waveform-audio output device. This commonly maps to master.
-        winmm.waveOutSetVolume(ctypes.c_uint(0), ctypes.c_uint(dwVolume))
+        # Using hwo = 0 (None) sets the first waveform-audio output device. This commonly maps to master.
+        winmm.waveOutSetVolume(None, dwVolume)
     except Exception as e:
         # swallow errors but print for debugging
-        print(_c("Volume set failed:", C_RED), e)
+        _log(_c("Volume set failed:", C_RED), e)
+
+# '[' / ']' volume presets: vk -> (precomputed dwVolume, feedback line), so a keypress costs one
+# winmm call and no float math.
+_VOLUME_PRESETS = {
+    VK_OEM_4: (_volume_dword(24.0), "Volume -> 24%"),  # '['
+    VK_OEM_6: (_volume_dword(42.0), "Volume -> 42%"),  # ']'
+}
 
-# Low-level keyboard hook: track keydown/up in pressed_keys and block as required.
+# Side effects the hook must not perform inline (waveOutSetVolume can block on the audio stack, and
+# a slow hook gets dropped by Windows). The hook appends the vk and sets _fx_wake; the side-effects
+# worker drains the deque. deque.append/popleft are thread-safe without a lock.
+_fx_q = collections.deque()
+_fx_wake = threading.Event()
+
+def hook_side_effects_worker(stop_event):
+    while not stop_event.is_set():
+        _fx_wake.wait()
+        _fx_wake.clear()
+        while _fx_q:
+            preset = _VOLUME_PRESETS.get(_fx_q.popleft())
+            if preset is not None:
+                _set_volume_raw(preset[0])
+                # print feedback
+                _log(_c(preset[1], C_BLUE))
+
+# Low-level keyboard hook: track keydown/up in _pressed_mask and block as required.
+# No blanket try/except here: nothing on the state-update path can raise for a valid KBDLLHOOKSTRUCT,
+# the SendInput/volume side effects guard themselves, and a real bug should surface as a traceback
+# (ctypes prints it and the key passes through) instead of being swallowed silently.
 def _low_level_keyboard_proc(nCode, wParam, lParam):
-    global active, synth_shift_active, synth_shift_vk
-    try:
-        if nCode >= 0:
-            k = ctypes.cast(lParam, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents
-            vk = int(k.vkCode)
-            flags = int(k.flags)
-            # Detect injected events: LLKHF_INJECTED == 0x10
-            injected = (flags & 0x10) != 0
-
-            # Handle keydown / keyup tracking BUT ignore synthetic/injected events
-            if not injected:
-                if wParam == WM_KEYDOWN or wParam == WM_SYSKEYDOWN:
-                    with pressed_lock:
-                        pressed_keys.add(vk)
-                elif wParam == WM_KEYUP or wParam == WM_SYSKEYUP:
-                    with pressed_lock:
-                        pressed_keys.discard(vk)
-
-            # Determine modifiers
-            with pressed_lock:
-                ctrl_held = (VK_LCONTROL in pressed_keys) or (VK_RCONTROL in pressed_keys) or (VK_CONTROL in pressed_keys)
-                alt_held = (VK_LMENU in pressed_keys) or (VK_RMENU in pressed_keys) or (VK_MENU in pressed_keys)
-                shift_held = (VK_LSHIFT in pressed_keys) or (VK_RSHIFT in pressed_keys)
-                win_held = (VK_LWIN in pressed_keys) or (VK_RWIN in pressed_keys)
-
-            # Special handling: allow Shift+Enter to reach the app by synthesizing Shift while Enter is pressed
-            # Only needed when we would otherwise block Shift (i.e., active and not ctrl_held).
-            if not injected:
-                if (wParam == WM_KEYDOWN or wParam == WM_SYSKEYDOWN) and vk == VK_RETURN:
-                    if active and not ctrl_held and shift_held and not synth_shift_active:
-                        # Prefer left shift if held; else right; default to left as fallback
-                        used_vk = VK_LSHIFT if (VK_LSHIFT in pressed_keys) else (VK_RSHIFT if (VK_RSHIFT in pressed_keys) else VK_LSHIFT)
-                        try:
-                            send_vk_down(used_vk)
-                            synth_shift_active = True
-                            synth_shift_vk = used_vk
-                        except Exception:
-                            pass
-                elif (wParam == WM_KEYUP or wParam == WM_SYSKEYUP) and (vk == VK_LSHIFT or vk == VK_RSHIFT):
-                    # On physical shift release, release our synthetic shift if we had one
-                    if synth_shift_active and synth_shift_vk == vk:
-                        try:
-                            send_vk_up(synth_shift_vk)
-                        except Exception:
-                            pass
-                        synth_shift_active = False
-                        synth_shift_vk = None
-
-            # Immediate '[' and ']' handling: set system volume on physical (non-injected) keydown.
-            # We do NOT block these keys — they are allowed through.
-            if not injected and (wParam == WM_KEYDOWN or wParam == WM_SYSKEYDOWN):
-                if vk == VK_OEM_4:  # '['
-                    set_master_volume_percent(24.0)
-                    # print feedback
-                    print(_c("Volume -> 24%", C_BLUE))
-                elif vk == VK_OEM_6:  # ']'
-                    set_master_volume_percent(42.0)
-                    print(_c("Volume -> 42%", C_BLUE))
-
-            # Decide whether to block the key from other apps
-            # Only block physical (non-injected) keys we care about when active and neither Ctrl nor Win is held.
-            if not injected:
-                # Always-blocked keys (backtick)
-                if _always_block_key(vk):
-                    return int(1)
-
-                # If this is TAB and Alt is held, let it through (so Alt+Tab works normally)
-                if vk == VK_TAB and alt_held:
+    global active, synth_shift_active, synth_shift_vk, _pressed_mask
+    # Injected events (LLKHF_INJECTED == 0x10, which includes our own SendInput output) are never
+    # tracked or blocked, so they go straight to the next hook after a single flags read.
+    if nCode >= 0 and not (ctypes.c_uint32.from_address(lParam + _KB_FLAGS_OFF).value & 0x10):
+        vk = ctypes.c_uint32.from_address(lParam + _KB_VK_OFF).value
+        f = _KEY_FLAGS[vk]
+        # Most keystrokes (ordinary typing) are keys we neither track nor block
+        if not f:
+            return _call_next_hook(hook_handle, nCode, wParam, lParam)
+        is_down = wParam == WM_KEYDOWN or wParam == WM_SYSKEYDOWN
+        is_up = wParam == WM_KEYUP or wParam == WM_SYSKEYUP
+
+        # Handle keydown / keyup tracking.
+        # The update is done on a local copy and published with one store; the modifier
+        # checks below read that same local instead of the global again.
+        # Keyboard auto-repeat re-sends keydowns for a held key; those leave the mask unchanged and
+        # must not wake the worker (an extra wake is an extra tick, i.e. an extra movement step).
+        mask = _pressed_mask
+        bit = _VK_BIT_TABLE[vk]
+        if bit:
+            if is_down:
+                if not (mask & bit):
+                    mask |= bit
+                    _pressed_mask = mask
+                    _set_event(_wake_event)
+            elif is_up:
+                if mask & bit:
+                    mask &= ~bit
+                    _pressed_mask = mask
+                    _set_event(_wake_event)
+
+        # Determine modifiers
+        ctrl_held = (mask & MASK_CTRL) != 0
+        alt_held = (mask & MASK_ALT) != 0
+        shift_held = (mask & MASK_SHIFT) != 0
+        win_held = (mask & MASK_WIN) != 0
+
+        # Special handling: allow Shift+Enter to reach the app by synthesizing Shift while Enter is pressed
+        # Only needed when we would otherwise block Shift (i.e., active and not ctrl_held).
+        if is_down and vk == VK_RETURN:
+            if active and not ctrl_held and shift_held and not synth_shift_active:
+                # Prefer left shift if held; else right; default to left as fallback
+                used_vk = VK_LSHIFT if (mask & BIT_LSHIFT) else (VK_RSHIFT if (mask & BIT_RSHIFT) else VK_LSHIFT)
+                try:
+                    SendInput(1, _SHIFT_DOWN_ARG[used_vk], _INPUT_SIZE)
+                    synth_shift_active = True
+                    synth_shift_vk = used_vk
+                except Exception:
                     pass
-                else:
-                    # block script keys only when active and Ctrl is NOT held and Win is NOT held
-                    if (vk in SCRIPT_KEYS) and active and not ctrl_held and not win_held:
-                        return int(1)
-    except Exception:
-        # Never allow exceptions to escape the callback; forward to next hook
-        pass
+        elif is_up and (vk == VK_LSHIFT or vk == VK_RSHIFT):
+            # On physical shift release, release our synthetic shift if we had one
+            if synth_shift_active and synth_shift_vk == vk:
+                try:
+                    SendInput(1, _SHIFT_UP_ARG[synth_shift_vk], _INPUT_SIZE)
+                except Exception:
+                    pass
+                synth_shift_active = False
+                synth_shift_vk = None
+
+        # Immediate '[' and ']' handling: set system volume on physical keydown.
+        # The volume change itself runs on the side-effects worker so the hook returns right away.
+        # We do NOT block these keys — they are allowed through.
+        if is_down and (vk == VK_OEM_4 or vk == VK_OEM_6):
+            _fx_q.append(vk)
+            _fx_wake.set()
+
+        # Decide whether to block the key from other apps
+        # Only block keys we care about when active and neither Ctrl nor Win is held.
+        # Always-blocked keys (backtick)
+        if f & KF_ALWAYS_BLOCK:
+            return 1
+        # Script keys only when active and Ctrl/Win are NOT held; TAB passes while Alt is held
+        # so Alt+Tab works normally.
+        if (f & KF_SCRIPT) and active and not ctrl_held and not win_held \
+                and not ((f & KF_ALT_PASS) and alt_held):
+            return 1
 
     # Otherwise pass to next hook
-    try:
-        return int(user32.CallNextHookEx(hook_handle, nCode, wParam, lParam))
-    except Exception:
-        return int(0)
+    return _call_next_hook(hook_handle, nCode, wParam, lParam)
 
 def install_keyboard_hook():
-    global hook_handle, _hook_proc_ref, _loaded_module_handle
+    global hook_handle, _hook_proc_ref
     # keep callback alive
     hook_proc = HOOKPROC(_low_level_keyboard_proc)
     _hook_proc_ref = hook_proc
 
-    # Try a few module handle strategies (similar to previous robust script)
-    tried = []
-    # 1: GetModuleHandleW(None)
-    try:
-        h = kernel32.GetModuleHandleW(None)
-        if h:
-            hinst = ctypes.wintypes.HINSTANCE(h)
-            hook_handle = user32.SetWindowsHookExW(WH_KEYBOARD_LL, hook_proc, hinst, 0)
-            tried.append(("GetModuleHandleW(None)", h, bool(hook_handle)))
-            if hook_handle:
-                return hook_handle
-    except Exception:
-        pass
-
-    # 2: ctypes.pythonapi._handle
-    try:
-        h = getattr(ctypes.pythonapi, "_handle", None)
-        if h:
-            hinst = ctypes.wintypes.HINSTANCE(int(h))
-            hook_handle = user32.SetWindowsHookExW(WH_KEYBOARD_LL, hook_proc, hinst, 0)
-            tried.append(("ctypes.pythonapi._handle", h, bool(hook_handle)))
-            if hook_handle:
-                return hook_handle
-    except Exception:
-        pass
-
-    # 3: GetModuleHandleW(exe basename)
-    try:
-        exe_basename = os.path.basename(sys.executable)
-        if exe_basename:
-            h = kernel32.GetModuleHandleW(exe_basename)
-            if h:
-                hinst = ctypes.wintypes.HINSTANCE(h)
-                hook_handle = user32.SetWindowsHookExW(WH_KEYBOARD_LL, hook_proc, hinst, 0)
-                tried.append((f"GetModuleHandleW({exe_basename})", h, bool(hook_handle)))
-                if hook_handle:
-                    return hook_handle
-    except Exception:
-        pass
-
-    # 4: try LoadLibraryW on python DLLs next to exe
-    try:
-        exe_dir = os.path.dirname(sys.executable) or os.getcwd()
-        for path in glob.glob(os.path.join(exe_dir, "python*.dll")):
-            try:
-                lib = kernel32.LoadLibraryW(path)
-                if lib:
-                    hinst = ctypes.wintypes.HINSTANCE(lib)
-                    hook_handle = user32.SetWindowsHookExW(WH_KEYBOARD_LL, hook_proc, hinst, 0)
-                    tried.append((f"LoadLibraryW({path})", lib, bool(hook_handle)))
-                    if hook_handle:
-                        _loaded_module_handle = lib
-                        return hook_handle
-                    else:
-                        # free and continue
-                        kernel32.FreeLibrary(lib)
-            except Exception:
-                pass
-    except Exception:
-        pass
-
-    # report failure
-    msg = "Failed to install keyboard hook. Attempts:\n"
-    for entry in tried:
-        msg += f"  {entry[0]} => handle {entry[1]} installed={entry[2]}\n"
-    msg += "Last WinErr: " + _format_last_error()
-    raise OSError(msg)
+    # WH_KEYBOARD_LL hooks are global and never injected into other processes, so the module handle
+    # of the current process (GetModuleHandleW(None)) is always a valid hMod.
+    hinst = ctypes.wintypes.HINSTANCE(kernel32.GetModuleHandleW(None))
+    hook_handle = user32.SetWindowsHookExW(WH_KEYBOARD_LL, hook_proc, hinst, 0)
+    if not hook_handle:
+        _hook_proc_ref = None
+        raise OSError("SetWindowsHookExW failed: " + _format_last_error())
+    return hook_handle
 
 def uninstall_keyboard_hook():
-    global hook_handle, _hook_proc_ref, _loaded_module_handle
+    global hook_handle, _hook_proc_ref
     if hook_handle:
         try:
             user32.UnhookWindowsHookEx(hook_handle)
         except Exception:
             pass
         hook_handle = None
-    if _loaded_module_handle:
-        try:
-            kernel32.FreeLibrary(ctypes.c_void_p(_loaded_module_handle))
-        except Exception:
-            pass
-        _loaded_module_handle = None
     _hook_proc_ref = None
 
+# Ctrl+C wakeup for the message pump. Python runs signal handlers only on the main thread, between
+# bytecodes; while the main thread is parked in a message wait, _sigint_handler (and its
+# PostQuitMessage) would wait for the next message to arrive. The C-level handler, however, writes a
+# byte to the signal.set_wakeup_fd socket right away, and WSAEventSelect turns that socket becoming
+# readable into a Win32 event the pump can wait on next to its message queue.
+def install_signal_wakeup():
+    global _wakeup_socks, _wakeup_event
+    try:
+        rd, wr = socket.socketpair()
+    except OSError:
+        return None
+    event = None
+    try:
+        wr.setblocking(False)
+        event = ws2_32.WSACreateEvent()
+        if not event or ws2_32.WSAEventSelect(rd.fileno(), event, FD_READ) != 0:  # also makes rd non-blocking
+            raise OSError("WSAEventSelect failed")
+        signal.set_wakeup_fd(wr.fileno())
+    except (OSError, ValueError):
+        if event:
+            ws2_32.WSACloseEvent(event)
+        rd.close()
+        wr.close()
+        return None
+    _wakeup_socks = (rd, wr)
+    _wakeup_event = event
+    return event
+
+def uninstall_signal_wakeup():
+    global _wakeup_socks, _wakeup_event
+    if _wakeup_event is None:
+        return
+    signal.set_wakeup_fd(-1)
+    for sock in _wakeup_socks:
+        sock.close()
+    ws2_32.WSACloseEvent(_wakeup_event)
+    _wakeup_socks = None
+    _wakeup_event = None
+
 # message pump (must run in the thread that installed the hook)
 def message_pump():
+    # The LL hook is delivered to this thread like a sent message, i.e. from inside GetMessageW /
+    # PeekMessageW, so the loop only has to keep calling them. This thread owns no windows, so there is
+    # nothing to translate or dispatch; we just wait for WM_QUIT or an error.
     msg = ctypes.wintypes.MSG()
+    pmsg = ctypes.byref(msg)
+    if _wakeup_event is None:
+        get_message = user32.GetMessageW
+        while True:
+            bRet = get_message(pmsg, None, 0, 0)
+            if bRet == 0 or bRet == -1:
+                break
+        return
+
+    # Wait for either queue activity (QS_ALLINPUT includes the sent hook calls) or the Ctrl+C wakeup,
+    # then empty the queue with PeekMessageW.
+    msg_wait = user32.MsgWaitForMultipleObjectsEx
+    peek_message = user32.PeekMessageW
+    handles = (ctypes.wintypes.HANDLE * 1)(_wakeup_event)
+    rd = _wakeup_socks[0]
     while True:
-        bRet = user32.GetMessageW(ctypes.byref(msg), None, 0, 0)
-        if bRet == 0 or bRet == -1:
+        r = msg_wait(1, handles, INFINITE, QS_ALLINPUT, MWMO_INPUTAVAILABLE)
+        if r == WAIT_OBJECT_0:
+            # Back in bytecode, so the pending _sigint_handler runs now and posts WM_QUIT. Drain the
+            # wakeup bytes and re-arm the event for the next signal.
+            kernel32.ResetEvent(_wakeup_event)
+            try:
+                while rd.recv(64):
+                    pass
+            except OSError:
+                pass
+        elif r != WAIT_OBJECT_0 + 1:  # WAIT_FAILED
             break
-        user32.TranslateMessage(ctypes.byref(msg))
-        user32.DispatchMessageW(ctypes.byref(msg))
+        while peek_message(pmsg, None, 0, 0, PM_REMOVE):
+            if msg.message == WM_QUIT:
+                return
 
-# movement + behavior worker reads pressed_keys (NOT GetAsyncKeyState)
+# movement + behavior worker reads _pressed_mask (NOT GetAsyncKeyState)
 def movement_worker(stop_event):
     global active, dragging_active
     # STEP=4 with TICK=0.01 -> ~400 px/s default
     STEP = 4
     TICK = 0.01
     MIN_STEP, MAX_STEP = 1, 50
+    # Shift while moving -> 25% speed (75% slower); integer round-half-up of STEP/4, at least 1.
+    STEP_SHIFT = max(1, (STEP + 2) >> 2)
 
     SCROLL_AMOUNT = WHEEL_DELTA
     # 50% slower than before (was 0.05s => 20/s); now 0.10s => 10/s
     SCROLL_INTERVAL = 0.10
-
+    # monitors can be added/rearranged while we run; re-read the cached bounds this often
+    SCREEN_REFRESH_INTERVAL = 5.0
+    SCROLL_INTERVAL_NS = int(SCROLL_INTERVAL * 1_000_000_000)
+    SCREEN_REFRESH_INTERVAL_NS = int(SCREEN_REFRESH_INTERVAL * 1_000_000_000)
+    # A late tick sends the notches it missed as one wheel event (mouseData = k * WHEEL_DELTA), but
+    # never more than this many, so a long stall (e.g. the machine sleeping with the key held) can't
+    # turn into a huge jump.
+    SCROLL_CATCHUP_MAX = 10
+
+    # Run slightly above normal priority so ticks aren't delayed behind ordinary foreground work
     try:
-        user32.SetProcessDPIAware()
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_ABOVE_NORMAL)
     except Exception:
         pass
 
-    left = user32.GetSystemMetrics(76)
-    top  = user32.GetSystemMetrics(77)
-    width = user32.GetSystemMetrics(78)
-    height = user32.GetSystemMetrics(79)
-    right = left + width - 1
-    bottom = top + height - 1
+    refresh_virtual_screen()
+    next_screen_refresh = time.perf_counter_ns() + SCREEN_REFRESH_INTERVAL_NS
 
     def px_per_sec(step): return int(step / TICK)
 
@@ -645,196 +864,271 @@ def movement_worker(stop_event):
     print("  - Quit: Ctrl+C")
     print(_c(f"Status: ON  | Move: ~{px_per_sec(STEP)} px/s | VScroll: {int(1/SCROLL_INTERVAL)} notches/s | HScroll: {int(1/SCROLL_INTERVAL)} notches/s", C_CYAN))
 
-    prev_shift = False
+    # Pressed mask as of the previous tick. Single keys edge-trigger on rising = mask & ~prev_mask;
+    # two-key groups (Shift, +, -) on "group held now, none of it held before". The click keys' bits
+    # are dropped from it while Ctrl/Win or OFF suppress them, so a key still held when the script
+    # becomes usable again fires once.
+    prev_mask = 0
+    EDGE_RESET_MASK = MASK_SHIFT | BIT_CAPITAL | BIT_F
+    # Mask the ON branch last decoded (held directions, scroll directions, drag state); -1 forces a
+    # re-decode after the Ctrl/Win or OFF branches ran.
+    last_mask = -1
     prev_scroll_pressed_v = False
     prev_scroll_pressed_h = False
-    next_scroll_time_v = 0.0
-    next_scroll_time_h = 0.0
-    prev_plus = prev_minus = False
-    prev_caps = False
-    prev_f = False
-    prev_backtick = False
+    next_scroll_time_v = 0
+    next_scroll_time_h = 0
+
+    # Cursor position we last sent. GetCursorPos is only consulted when movement starts and then every
+    # CURSOR_RESYNC_TICKS ticks, so a physical mouse nudge during a long keyboard move is still picked up.
+    CURSOR_RESYNC_TICKS = 10
+    cur_x = cur_y = 0
+    move_ticks = 0  # ticks since the last resync; 0 means re-read before the next move
+
+    # One INPUT array reused every tick; all events of a tick are flushed with a single SendInput.
+    # Worst case per tick: move(1) + scrolls(2) + left click(2) + drag(1) + caps/right click(6) + middle click(2).
+    buf = (INPUT * 16)()
+    buf_ptr = ctypes.cast(buf, ctypes.POINTER(INPUT))
+
+    # Periodic waitable timer for the movement cadence, armed only while something repeats. The
+    # high-resolution flag needs Windows 10 1803+; older systems get a plain timer, which
+    # timeBeginPeriod(1) in main() keeps at ~1 ms granularity. With no timer at all we fall back to
+    # a timed wait on the wake event.
+    TICK_MS = int(TICK * 1000)
+    timer = (kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS)
+             or kernel32.CreateWaitableTimerExW(None, None, 0, TIMER_ALL_ACCESS))
+    timer_due = ctypes.wintypes.LARGE_INTEGER(-int(TICK * 10_000_000))  # relative, 100 ns units
+    timer_due_arg = ctypes.byref(timer_due)
+    wait_handles = (ctypes.wintypes.HANDLE * 2)(_wake_event, timer)
+    timer_armed = False
+
+    def wait_for_next_tick(keep_ticking):
+        # Tick on the timer while something repeats; otherwise cancel it and idle until the hook
+        # reports a key change (no wakeups at all while nothing is held).
+        nonlocal timer_armed
+        if keep_ticking:
+            if not timer_armed and timer:
+                timer_armed = bool(kernel32.SetWaitableTimer(timer, timer_due_arg, TICK_MS, None, None, False))
+            if timer_armed:
+                kernel32.WaitForMultipleObjects(2, wait_handles, False, INFINITE)
+            else:
+                kernel32.WaitForSingleObject(_wake_event, TICK_MS)
+        else:
+            if timer_armed:
+                kernel32.CancelWaitableTimer(timer)
+                timer_armed = False
+            kernel32.WaitForSingleObject(_wake_event, INFINITE)
+
+    # Per-tick callables and tables bound to locals so the loop does LOAD_FAST instead of a globals
+    # (and module attribute) lookup. The _VS_* bounds stay globals: refresh_virtual_screen rebinds them.
+    perf_ns = time.perf_counter_ns
+    move_dir = _MOVE_DIR
+    queue_move = queue_cursor_pos
+    flush = flush_inputs
+    # Event.is_set() is a plain flag read (no lock); binding it just skips the attribute lookup.
+    # Shutdown sets the event and then signals _wake_event, so the wait below returns promptly.
+    stopping = stop_event.is_set
 
     try:
-        while not stop_event.is_set():
-            now = time.time()
+        while not stopping():
+            n = 0
+            # True while something repeats on a timer (movement / held scroll keys)
+            keep_ticking = False
 
-            with pressed_lock:
-                snapshot = set(pressed_keys)
-
-            # Also treat Arrow keys as WASD for movement/drag logic
-            effective = set(snapshot)
-            if VK_UP in snapshot: effective.add(VK_W)
-            if VK_LEFT in snapshot: effective.add(VK_A)
-            if VK_DOWN in snapshot: effective.add(VK_S)
-            if VK_RIGHT in snapshot: effective.add(VK_D)
+            mask = _pressed_mask
+            # keys that went down since the previous tick
+            rising = mask & ~prev_mask
 
             # detect modifier keys
-            ctrl_held = (VK_LCONTROL in snapshot) or (VK_RCONTROL in snapshot) or (VK_CONTROL in snapshot)
-            alt_held = (VK_LMENU in snapshot) or (VK_RMENU in snapshot) or (VK_MENU in snapshot)
-            win_held = (VK_LWIN in snapshot) or (VK_RWIN in snapshot)
-
-            # Toggle with ` (backtick)
-            backtick_now = VK_OEM_3 in snapshot
-            if backtick_now and not prev_backtick:
-                active = not active
-                print(_c(f"* Script {'ON' if active else 'OFF'}", C_GREEN if active else C_RED))
-                # If we turned OFF, ensure no drag is left held
-                if not active and dragging_active:
-                    try:
-                        send_left_up()
-                    except Exception:
-                        pass
-                    dragging_active = False
-            prev_backtick = backtick_now
+            ctrl_held = (mask & MASK_CTRL) != 0
+            alt_held = (mask & MASK_ALT) != 0
+            win_held = (mask & MASK_WIN) != 0
+
+            # Press-edge actions. Every edge (single key or group) has a rising bit, so on the common
+            # tick where nothing went down (timer repeats while a key is held) the whole block is skipped.
+            if rising:
+                # Toggle with ` (backtick)
+                if rising & BIT_OEM_3:
+                    active = not active
+                    _log(_c(f"* Script {'ON' if active else 'OFF'}", C_GREEN if active else C_RED))
+                    # If we turned OFF, ensure no drag is left held
+                    if not active and dragging_active:
+                        n = queue_left_up(buf, n)
+                        dragging_active = False
 
-            # Speed adjust
-            plus_now = (VK_OEM_PLUS in snapshot) or (VK_ADD in snapshot)
-            minus_now = (VK_OEM_MINUS in snapshot) or (VK_SUBTRACT in snapshot)
-            if active:
-                if plus_now and not prev_plus:
-                    STEP = min(MAX_STEP, STEP + 1)
-                    print(_c(f"* Speed: ~{px_per_sec(STEP)} px/s (STEP={STEP})", C_YELLOW))
-                if minus_now and not prev_minus:
-                    STEP = max(MIN_STEP, STEP - 1)
-                    print(_c(f"* Speed: ~{px_per_sec(STEP)} px/s (STEP={STEP})", C_YELLOW))
-            prev_plus = plus_now; prev_minus = minus_now
+                # Speed adjust
+                if active:
+                    if (rising & MASK_PLUS) and not (prev_mask & MASK_PLUS):
+                        STEP = min(MAX_STEP, STEP + 1)
+                        STEP_SHIFT = max(1, (STEP + 2) >> 2)
+                        _log(_c(f"* Speed: ~{px_per_sec(STEP)} px/s (STEP={STEP})", C_YELLOW))
+                    if (rising & MASK_MINUS) and not (prev_mask & MASK_MINUS):
+                        STEP = max(MIN_STEP, STEP - 1)
+                        STEP_SHIFT = max(1, (STEP + 2) >> 2)
+                        _log(_c(f"* Speed: ~{px_per_sec(STEP)} px/s (STEP={STEP})", C_YELLOW))
 
             # If Ctrl or Windows key held, disable script actions so shortcuts work normally
             if ctrl_held or win_held:
                 # Reset edge trackers so next press triggers correctly when Ctrl/Win released
-                prev_shift = False
+                prev_mask = mask & ~EDGE_RESET_MASK
+                last_mask = -1
                 prev_scroll_pressed_v = False
                 prev_scroll_pressed_h = False
-                next_scroll_time_v = 0.0
-                next_scroll_time_h = 0.0
-                prev_caps = False
-                prev_f = False
+                next_scroll_time_v = 0
+                next_scroll_time_h = 0
+                move_ticks = 0
                 # If we were dragging, ensure release so we don't leave mouse stuck
                 if dragging_active:
-                    try:
-                        send_left_up()
-                    except Exception:
-                        pass
+                    n = queue_left_up(buf, n)
                     dragging_active = False
-                time.sleep(TICK)
+                flush(buf_ptr, n)
+                wait_for_next_tick(False)
                 continue
 
             # If Alt is held, make sure we aren't starting/continuing a drag caused by Tab
             if alt_held:
                 if dragging_active:
-                    try:
-                        send_left_up()
-                    except Exception:
-                        pass
+                    n = queue_left_up(buf, n)
                     dragging_active = False
 
             if active:
-                # Movement
-                shift_now = (VK_LSHIFT in snapshot) or (VK_RSHIFT in snapshot)
-                # Determine speed multiplier: if shift held while moving, reduce speed to 25% (75% slower)
-                speed_multiplier = 0.25 if shift_now else 1.0
-                step_effective = max(1, int(round(STEP * speed_multiplier)))
+                # Everything decoded from the held keys (and the drag/click decisions below) depends
+                # only on the mask. On timer repeats with an unchanged mask, the steady state while
+                # moving or scrolling, only the continuous movement/scroll work runs.
+                changed = mask != last_mask
+                if changed:
+                    last_mask = mask
+                    shift_now = (mask & MASK_SHIFT) != 0
+                    sx, sy = move_dir[mask & MASK_MOVE]
+
+                    # Vertical Scrolling (1 up, 2 down)
+                    up_pressed = (mask & MASK_SCROLL_UP) != 0
+                    down_pressed = (mask & MASK_SCROLL_DOWN) != 0
+                    scroll_dir_v = 1 if up_pressed and not down_pressed else (-1 if down_pressed and not up_pressed else 0)
+                    scroll_pressed_v = scroll_dir_v != 0
+
+                    # Horizontal Scrolling (3 left, 4 right)
+                    left_pressed = (mask & MASK_SCROLL_LEFT) != 0
+                    right_pressed = (mask & MASK_SCROLL_RIGHT) != 0
+                    # For HWHEEL: positive is RIGHT, negative is LEFT
+                    scroll_dir_h = (1 if right_pressed and not left_pressed else (-1 if left_pressed and not right_pressed else 0))
+                    scroll_pressed_h = scroll_dir_h != 0
 
-                dx = step_effective * (int(VK_D in effective) - int(VK_A in effective))
-                dy = step_effective * (int(VK_S in effective) - int(VK_W in effective))
+                # Movement
+                # if shift held while moving, reduce speed to 25% (75% slower)
+                step_effective = STEP_SHIFT if shift_now else STEP
+                dx = step_effective * sx
+                dy = step_effective * sy
                 if dx != 0 or dy != 0:
-                    x, y = get_cursor_pos()
-                    nx = max(left, min(right, x + dx))
-                    ny = max(top,  min(bottom, y + dy))
-                    set_cursor_pos(nx, ny)
-
-                # Vertical Scrolling (1 up, 2 down)
-                up_pressed = (VK_1 in snapshot) or (VK_NUMPAD1 in snapshot)
-                down_pressed = (VK_2 in snapshot) or (VK_NUMPAD2 in snapshot)
-                scroll_dir_v = 1 if up_pressed and not down_pressed else (-1 if down_pressed and not up_pressed else 0)
-                scroll_pressed_v = scroll_dir_v != 0
+                    if move_ticks == 0:
+                        cur_x, cur_y = get_cursor_pos()
+                        # the cached bounds only matter while moving, so check their age here
+                        t = perf_ns()
+                        if t >= next_screen_refresh:
+                            refresh_virtual_screen()
+                            next_screen_refresh = t + SCREEN_REFRESH_INTERVAL_NS
+                    move_ticks = (move_ticks + 1) % CURSOR_RESYNC_TICKS
+                    # clamp to the virtual screen with plain compares (no min/max calls)
+                    nx = cur_x + dx
+                    nx = _VS_LEFT if nx < _VS_LEFT else (_VS_RIGHT if nx > _VS_RIGHT else nx)
+                    ny = cur_y + dy
+                    ny = _VS_TOP if ny < _VS_TOP else (_VS_BOTTOM if ny > _VS_BOTTOM else ny)
+                    # pinned against a screen edge: nothing to send
+                    if nx != cur_x or ny != cur_y:
+                        cur_x, cur_y = nx, ny
+                        n = queue_move(buf, n, cur_x, cur_y)
+                else:
+                    move_ticks = 0
+
+                # Only the scroll repeat needs the clock (monotonic QueryPerformanceCounter, integer ns)
+                if scroll_pressed_v or scroll_pressed_h:
+                    now = perf_ns()
+
                 if scroll_pressed_v:
-                    if not prev_scroll_pressed_v or now >= next_scroll_time_v:
-                        send_scroll(scroll_dir_v * SCROLL_AMOUNT)
-                        next_scroll_time_v = now + SCROLL_INTERVAL
+                    if not prev_scroll_pressed_v:
+                        n = queue_scroll(buf, n, scroll_dir_v * SCROLL_AMOUNT)
+                        next_scroll_time_v = now + SCROLL_INTERVAL_NS
+                    elif now >= next_scroll_time_v:
+                        notches = (now - next_scroll_time_v) // SCROLL_INTERVAL_NS + 1
+                        if notches > SCROLL_CATCHUP_MAX:
+                            # stale deadline: cap the burst and restart the cadence from now
+                            notches = SCROLL_CATCHUP_MAX
+                            next_scroll_time_v = now + SCROLL_INTERVAL_NS
+                        else:
+                            next_scroll_time_v += notches * SCROLL_INTERVAL_NS
+                        n = queue_scroll(buf, n, scroll_dir_v * SCROLL_AMOUNT * notches)
                 else:
-                    next_scroll_time_v = 0.0
-
-                # Horizontal Scrolling (3 left, 4 right)
-                left_pressed = (VK_3 in snapshot) or (VK_NUMPAD3 in snapshot)
-                right_pressed = (VK_4 in snapshot) or (VK_NUMPAD4 in snapshot)
-                # For HWHEEL: positive is RIGHT, negative is LEFT
-                scroll_dir_h = (1 if right_pressed and not left_pressed else (-1 if left_pressed and not right_pressed else 0))
-                scroll_pressed_h = scroll_dir_h != 0
+                    next_scroll_time_v = 0
+
                 if scroll_pressed_h:
-                    if not prev_scroll_pressed_h or now >= next_scroll_time_h:
-                        send_hscroll(scroll_dir_h * SCROLL_AMOUNT)
-                        next_scroll_time_h = now + SCROLL_INTERVAL
+                    if not prev_scroll_pressed_h:
+                        n = queue_hscroll(buf, n, scroll_dir_h * SCROLL_AMOUNT)
+                        next_scroll_time_h = now + SCROLL_INTERVAL_NS
+                    elif now >= next_scroll_time_h:
+                        notches = (now - next_scroll_time_h) // SCROLL_INTERVAL_NS + 1
+                        if notches > SCROLL_CATCHUP_MAX:
+                            # stale deadline: cap the burst and restart the cadence from now
+                            notches = SCROLL_CATCHUP_MAX
+                            next_scroll_time_h = now + SCROLL_INTERVAL_NS
+                        else:
+                            next_scroll_time_h += notches * SCROLL_INTERVAL_NS
+                        n = queue_hscroll(buf, n, scroll_dir_h * SCROLL_AMOUNT * notches)
                 else:
-                    next_scroll_time_h = 0.0
-
-                # Dragging logic CHANGE:
-                # - Start drag when Tab is down AND (Shift OR any WASD/Arrow) becomes true (Tab-first or keys-first both work).
-                # - Once dragging started, KEEP dragging while Tab remains held (regardless of movement keys).
-                # - Releasing Tab (or Alt/Ctrl/script off) stops dragging.
-                tab_now = VK_TAB in snapshot
-                wasd_or_arrows_held = any(k in effective for k in (VK_W, VK_A, VK_S, VK_D))
-                start_drag_condition = (tab_now and (shift_now or wasd_or_arrows_held)) and (not alt_held)
-
-                # Shift click (fire on press edge) -- but skip if this press is starting a drag or we are currently dragging
-                if shift_now and not prev_shift:
-                    if (not wasd_or_arrows_held) and (not start_drag_condition) and (not dragging_active):
-                        send_left_click()
-                prev_shift = shift_now
+                    next_scroll_time_h = 0
                 prev_scroll_pressed_v = scroll_pressed_v
                 prev_scroll_pressed_h = scroll_pressed_h
 
-                # Start drag if not already dragging and start condition hit
-                if (not dragging_active) and start_drag_condition:
-                    try:
-                        send_left_down()
+                if changed:
+                    # Dragging logic CHANGE:
+                    # - Start drag when Tab is down AND (Shift OR any WASD/Arrow) becomes true (Tab-first or keys-first both work).
+                    # - Once dragging started, KEEP dragging while Tab remains held (regardless of movement keys).
+                    # - Releasing Tab (or Alt/Ctrl/script off) stops dragging.
+                    tab_now = (mask & BIT_TAB) != 0
+                    wasd_or_arrows_held = (mask & MASK_MOVE) != 0
+                    start_drag_condition = (tab_now and (shift_now or wasd_or_arrows_held)) and (not alt_held)
+
+                    # Shift click (fire on press edge) -- but skip if this press is starting a drag or we are currently dragging
+                    if (rising & MASK_SHIFT) and not (prev_mask & MASK_SHIFT):
+                        if (not wasd_or_arrows_held) and (not start_drag_condition) and (not dragging_active):
+                            n = queue_left_click(buf, n)
+
+                    # Start drag if not already dragging and start condition hit
+                    if (not dragging_active) and start_drag_condition:
+                        n = queue_left_down(buf, n)
                         dragging_active = True
-                    except Exception:
-                        pass
-                # Stop drag if we are dragging but Tab released or Alt is held (or script turned off)
-                elif dragging_active and (not tab_now or alt_held):
-                    try:
-                        send_left_up()
+                    # Stop drag if we are dragging but Tab released or Alt is held (or script turned off)
+                    elif dragging_active and (not tab_now or alt_held):
+                        n = queue_left_up(buf, n)
                         dragging_active = False
-                    except Exception:
-                        pass
-
-                # CapsLock -> perform double-toggle (net no state change) and then RIGHT CLICK (on press edge)
-                caps_now = VK_CAPITAL in snapshot
-                if caps_now and not prev_caps:
-                    try:
-                        send_caps_double_toggle()
-                        send_right_click()
-                    except Exception:
-                        pass
-                prev_caps = caps_now
-
-                # F -> Middle click (on press edge)
-                f_now = VK_F in snapshot
-                if f_now and not prev_f:
-                    try:
-                        send_middle_click()
-                    except Exception:
-                        pass
-                prev_f = f_now
+
+                    if rising & (BIT_CAPITAL | BIT_F):
+                        # CapsLock -> perform double-toggle (net no state change) and then RIGHT CLICK (on press edge)
+                        if rising & BIT_CAPITAL:
+                            n = queue_caps_right_click(buf, n)
+
+                        # F -> Middle click (on press edge)
+                        if rising & BIT_F:
+                            n = queue_middle_click(buf, n)
+                prev_mask = mask
+
+                keep_ticking = dx != 0 or dy != 0 or scroll_pressed_v or scroll_pressed_h
             else:
                 # When OFF, reset edge trackers so next press triggers immediately
-                prev_shift = False
+                prev_mask = mask & ~EDGE_RESET_MASK
+                last_mask = -1
                 prev_scroll_pressed_v = False
                 prev_scroll_pressed_h = False
-                next_scroll_time_v = 0.0
-                next_scroll_time_h = 0.0
-                prev_caps = False
-                prev_f = False
+                next_scroll_time_v = 0
+                next_scroll_time_h = 0
+                move_ticks = 0
                 if dragging_active:
-                    try:
-                        send_left_up()
-                    except Exception:
-                        pass
+                    n = queue_left_up(buf, n)
                     dragging_active = False
 
-            time.sleep(TICK)
+            # No try/except per flush: with SendInput's argtypes fixed and a prebuilt buffer, ctypes can't
+            # raise here (a blocked injection just returns fewer events sent). Anything unexpected ends
+            # the loop and the finally below still releases a held drag.
+            flush(buf_ptr, n)
+            wait_for_next_tick(keep_ticking)
     finally:
         # Ensure that if the worker exits we don't leave the left button held down
         if dragging_active:
@@ -845,12 +1139,21 @@ def movement_worker(stop_event):
             dragging_active = False
         # Ensure we don't leave a synthetic shift pressed
         _maybe_release_synth_shift()
+        if timer:
+            kernel32.CancelWaitableTimer(timer)
+            kernel32.CloseHandle(timer)
+
+def _release_drag():
+    if dragging_active:
+        send_left_up()
 
 # Graceful shutdown on Ctrl+C
 stop_evt = threading.Event()
 def _sigint_handler(signum, frame):
     # Ask message pump to quit and stop worker
     stop_evt.set()
+    kernel32.SetEvent(_wake_event)
+    _fx_wake.set()
     try:
         user32.PostQuitMessage(0)
     except Exception:
@@ -859,7 +1162,9 @@ def _sigint_handler(signum, frame):
 signal.signal(signal.SIGINT, _sigint_handler)
 
 def main():
+    enable_dpi_awareness()
     enable_vt_console_colors()
+    start_logger()
 
     # Install hook in main thread (message_pump will run here)
     try:
@@ -870,30 +1175,50 @@ def main():
         print("Try: run from an Administrator command prompt or use system python (not MS Store).")
         return
 
-    # Start movement worker
-    worker = threading.Thread(target=movement_worker, args=(stop_evt,), daemon=True)
-    worker.start()
+    # Teardown is registered as we go and runs in reverse order on exit (normal or exceptional):
+    # workers stopped and joined, left button and synthetic Shift released, timer resolution
+    # restored, hook removed, logger drained.
+    with contextlib.ExitStack() as cleanup:
+        cleanup.callback(print, _c("Keyboard hook removed. Exiting.", C_MAGENTA))
+        cleanup.callback(stop_logger)
+        cleanup.callback(uninstall_keyboard_hook)
+
+        # Let Ctrl+C interrupt the message wait immediately (falls back to plain GetMessageW if unavailable)
+        if install_signal_wakeup() is not None:
+            cleanup.callback(uninstall_signal_wakeup)
+
+        # Raise the system timer resolution to 1 ms so the worker's 10 ms waits don't round up to the
+        # default 15.6 ms tick (which made movement/scroll cadence uneven).
+        if winmm.timeBeginPeriod(1) == 0:  # TIMERR_NOERROR
+            cleanup.callback(winmm.timeEndPeriod, 1)
+
+        # Release any synthetic shift we may have pressed for Shift+Enter passthrough, and make sure
+        # dragging is released before the hook goes away
+        cleanup.callback(_maybe_release_synth_shift)
+        cleanup.callback(_release_drag)
+
+        # Start movement worker
+        worker = threading.Thread(target=movement_worker, args=(stop_evt,), daemon=True)
+        worker.start()
+        fx_worker = threading.Thread(target=hook_side_effects_worker, args=(stop_evt,), daemon=True)
+        fx_worker.start()
+
+        def stop_workers():
+            stop_evt.set()
+            kernel32.SetEvent(_wake_event)
+            _fx_wake.set()
+            worker.join(timeout=1.0)
+            fx_worker.join(timeout=1.0)
+        cleanup.callback(stop_workers)
+
+        # Everything allocated up to here lives for the whole run. Move it out of the collector's view so
+        # a GC pass that happens to trigger inside the hook callback only scans young objects and stays
+        # well under LowLevelHooksTimeout.
+        if hasattr(gc, "freeze"):
+            gc.freeze()
 
-    # Run message pump in main thread (required)
-    try:
+        # Run message pump in main thread (required)
         message_pump()
-    finally:
-        # ensure worker stops and hook removed
-        stop_evt.set()
-        try:
-            worker.join(timeout=1.0)
-        except Exception:
-            pass
-        # Make sure dragging released before uninstalling hook
-        try:
-            if dragging_active:
-                send_left_up()
-        except Exception:
-            pass
-        # Release any synthetic shift we may have pressed for Shift+Enter passthrough
-        _maybe_release_synth_shift()
-        uninstall_keyboard_hook()
-        print(_c("Keyboard hook removed. Exiting.", C_MAGENTA))
 
 if __name__ == "__main__":
     main()